@@ -12,37 +12,75 @@ Reading:
     .csv
     .tsv
     .bed
+    .zip (first member)
     
 write:
     .csv
     .txt
 """
 
-def read_txt(x, split,h):
-    import pandas as pd
-    with open(x+'.txt') as f:
-        lines = f.readlines()
-    
-    if h == True:
-        clmns = lines[0]  
-        clmns = list(clmns.split(split))
-        l = len(clmns)
-        if  clmns[l-1].endswith('\n'):
-            s = clmns[l-1]
-            sl = len(s)
-            clmns[l-1] = s[0:sl-1]
-        y = pd.DataFrame([x.strip().split(split) for x in lines], columns = clmns)
-        y.drop(y.index[0], axis=0, inplace=True)
-        y.reset_index(drop=True, inplace=True)
+import re
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:  # pyarrow is optional; the readers fall back to pandas
+    pa = None
+
+# parent directories already created by the writers in this process
+_ensured_dirs = set()
+
+
+def _ensure_parent(p):
+    # create the parent directory of p once, skip the mkdir syscalls afterwards
+    d = p.parent
+    if d not in _ensured_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(d)
+
+
+def _path(x, suffix):
+    # accept either a full path or a bare stem; the suffix is appended only if
+    # it is not already there (stems may contain dots, e.g. 'files_step2.genes')
+    p = Path(x)
+    return p if p.suffix == suffix else p.with_name(p.name + suffix)
+
+
+def _read_arrow(filepath, delimiter, h, dtype=None):
+    # multithreaded Arrow CSV reader; returns None if pyarrow is missing or fails
+    if pa is None:
+        return None
+    try:
+        tbl = pacsv.read_csv(
+            filepath,
+            read_options=pacsv.ReadOptions(use_threads=True,
+                                           autogenerate_column_names=not h),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter))
+    except pa.ArrowException:
+        return None
+    y = tbl.to_pandas(split_blocks=True, self_destruct=True)
+    if not h:
+        y.columns = range(y.shape[1])
+    if dtype is not None:
+        y = y.astype(dtype)
+    return y
+
+
+def read_txt(x, split,h, dtype=str):
+    # let the pandas C parser tokenize the file; by default all fields are kept
+    # as strings, pass dtype (e.g. {'POS': 'int64'}) when the schema is known.
+    # The C parser only takes single-character delimiters, longer ones are
+    # passed to the python engine as an escaped literal separator
+    if len(split) == 1:
+        engine, sep = "c", split
     else:
-        y = pd.DataFrame([x.strip().split(split) for x in lines])
-
-    # l = len(lines)
-    # y = pd.DataFrame()
-    # y = pd.DataFrame(y, columns=clmns )
-    # for i in range(l):
-    #     line_i = lines[i]  
-    #     y.loc[i,:] = list(line_i.split(","))
+        engine, sep = "python", re.escape(split)
+    y = pd.read_csv(_path(x, '.txt'), sep=sep, header=0 if h else None, engine=engine,
+                    dtype=dtype, na_filter=dtype is not str)
     return y
 
 def write_txt(x, y, d, h):
@@ -52,93 +90,73 @@ def write_txt(x, y, d, h):
     d: delimiter (e.g., ' ' or '\\t')
     h: whether to write header
     """
-    import numpy as np
-    from pathlib import Path
-
     if not isinstance(d, str) or d == "":
         raise ValueError(f"Delimiter d must be a non-empty string, got: {d!r}")
 
     # Build output path safely
-    out_path = Path(x)
-    if out_path.suffix != ".txt":
-        out_path = out_path.with_suffix(".txt")
+    out_path = _path(x, ".txt")
 
     # Create only the parent directory of the output file
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    # Convert DataFrame to array for np.savetxt, but keep header from columns
-    header = ""
-    data = y
+    _ensure_parent(out_path)
 
-    try:
-        # If y is a pandas DataFrame
-        cols = list(y.columns)
-        if h:
-            header = d.join(map(str, cols))
-        data = y.to_numpy()
-    except Exception:
+    if not isinstance(y, pd.DataFrame):
         # If y is not a DataFrame (already array-like)
         if h:
             raise ValueError("h=True requires a DataFrame with columns.")
+        y = pd.DataFrame(y)
 
-    np.savetxt(
-        str(out_path),
-        data,
-        fmt="%s",
-        delimiter=d,
-        newline="\n",
-        header=header,
-        comments=""  # prevents '#' being added to header
-    )
-        
-def read_parquet(x):
-    # read partitioned parquet files
-    import pandas as pd
-    from pathlib import Path
-    data_dir = Path(x)
-    y = pd.concat(
-        pd.read_parquet(parquet_file)
-        for parquet_file in data_dir.glob('*.parquet')
-    )
-    return y
+    # pandas' C writer, no intermediate object-array copy of the frame
+    y.to_csv(out_path, sep=d, index=False, header=h, lineterminator="\n")
+
+def read_parquet(x, columns=None):
+    # read partitioned parquet files as one dataset, files are read in parallel
+    # and only the requested columns are decoded
+    import pyarrow.dataset as ds
+    y = ds.dataset(x, format="parquet").to_table(columns=columns, use_threads=True)
+    return y.to_pandas(split_blocks=True, self_destruct=True)
 
 def read_xlsx(x):
-    import pandas as pd     
-    # read by default 1st sheet of an excel file
-    y = pd.read_excel(x+'.xlsx')
+    # read by default 1st sheet of an excel file; the Rust calamine engine is
+    # used when python-calamine is installed, otherwise pandas' default openpyxl
+    filepath = _path(x, '.xlsx')
+    try:
+        y = pd.read_excel(filepath, engine="calamine")
+    except (ImportError, ValueError):
+        # ImportError: python-calamine missing; ValueError: pandas < 2.2 has no
+        # calamine engine ("Unknown engine")
+        y = pd.read_excel(filepath)
     return y
 
-def read_tsv(x,h):
-    import pandas as pd  
-    from pathlib import Path
-    #import csv
+def read_tsv(x,h,dtype=str):
     # read by default 1st sheet of an tsv file
-    filepath = Path(x+'.tsv')
-    #y = pd.DataFrame()
-    y=[]
-    with open(filepath) as fd:
-        #rd = csv.reader(fd, delimiter=d, quotechar=q)
-        #df = pd.DataFrame([x.strip().split(' ') for x in rd])
-        for row in fd:
-            c = row.split('\t')
-            #c = pd.DataFrame([c])
-            #y = pd.concat([y, c], axis=0)
-            y.append(c)
-        y = pd.DataFrame(y) 
-        if h == True:
-            y.columns = y.loc[0,:]
-            y = y.drop(index=[0])
-            y.index = range(len(y))
-        return y
-
-def read_csv(x):
+    filepath = _path(x, '.tsv')
+    y = pd.read_csv(filepath, sep='\t', header=0 if h else None, engine='c',
+                    dtype=dtype, na_filter=dtype is not str)
+    return y
+
+def read_csv(x,dtype=None):
     # read by default 1st sheet of an csv file
-    import pandas as pd
-    y = pd.read_csv(x+'.csv')
+    filepath = _path(x, '.csv')
+    y = pd.read_csv(filepath, dtype=dtype)
+    return y
+
+def read_zip(x, split='\t', h=True, dtype=None):
+    # read the (first) text file of a .zip archive; Arrow parses the member
+    # while it is decompressed, pandas re-reads the archive if Arrow fails.
+    # split=r'\s+' (runs of whitespace) and dtype=str go to pandas directly: its
+    # C parser has a whitespace tokenizer and keeps the text as is ('007')
+    filepath = _path(x, '.zip')
+    if split != r'\s+' and dtype is not str:
+        with zipfile.ZipFile(filepath) as z, z.open(z.namelist()[0]) as fh:
+            y = _read_arrow(fh, split, h, dtype)
+        if y is not None:
+            return y
+    y = pd.read_csv(filepath, sep=split, header=0 if h else None, compression='zip',
+                    dtype=dtype, na_filter=dtype is not str)
     return y
 
 def write_csv(x,y):
-    from pathlib import Path
-    filepath = Path(y+'.csv')
-    filepath.parent.mkdir(parents=True, exist_ok=True)
+    # kept on pandas: Arrow's writer quotes strings and formats bools/floats differently
+    filepath = _path(y, '.csv')
+    _ensure_parent(filepath)
     x.to_csv(filepath,index=False)
@@ -3,12 +3,34 @@
 import fire
 import pandas as pd
 import numpy as np
-from statsmodels.stats.multitest import multipletests
+from scipy import sparse
+from scipy.special import ndtr
 import scdrs
 from typing import Dict, List
-import scanpy as sc
 import os
+import re
 import time
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+# File extension of the score outputs for each supported `--compression`
+_COMPRESSION_EXT = {"gzip": ".gz", "zstd": ".zst"}
+
+# AnnData shared with forked `compute_score` workers (inherited, never pickled)
+_WORKER_ADATA = None
 
 
 def get_cli_head():
@@ -22,6 +44,382 @@ def get_cli_head():
     return MASTHEAD
 
 
+def _cache_path(list_file, param, suffix):
+    """
+    Path of a cache file for results derived from the files in `list_file` and `param`.
+
+    The key hashes the path, mtime and size of each file (None entries allowed)
+    together with `repr(param)`. The cache folder is `$SCDRS_CACHE_DIR`, or
+    `<tmp>/scdrs_cache` if it is not set.
+    """
+    cache_dir = os.environ.get(
+        "SCDRS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "scdrs_cache")
+    )
+    hasher = hashlib.blake2b(digest_size=16)
+    for file in list_file:
+        if file is None:
+            hasher.update(b"None;")
+        else:
+            stat = os.stat(file)
+            hasher.update(
+                ("%s:%d:%d;" % (os.path.abspath(file), stat.st_mtime_ns, stat.st_size)).encode()
+            )
+    hasher.update(repr(param).encode())
+    return os.path.join(cache_dir, "%s%s" % (hasher.hexdigest(), suffix))
+
+
+def _write_h5ad_cache(adata, cache_path):
+    """
+    Write `adata` to `cache_path`; failures only print a warning.
+
+    The file is written to a temporary name and renamed, so concurrent runs never
+    read a partial cache.
+    """
+    tmp_path = "%s.%d.tmp.h5ad" % (cache_path[: -len(".h5ad")], os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        adata.write_h5ad(tmp_path, compression="lzf")
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print("Warning: failed to write cache %s: %s" % (cache_path, e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _preproc_cache_path(h5ad_file, cov_file, adj_prop, flag_filter_data, flag_raw_count):
+    """Path of the cached preprocessed AnnData for the given `compute_score` inputs."""
+    # n_mean_bin=20, n_var_bin=20 as in `compute_score`
+    return _cache_path(
+        [h5ad_file, cov_file],
+        (adj_prop, flag_filter_data, flag_raw_count, 20, 20),
+        ".preproc.h5ad",
+    )
+
+
+def _read_preproc_cache(cache_path):
+    """Read an AnnData written by `_write_preproc_cache`."""
+    import scanpy as sc
+
+    adata = sc.read_h5ad(cache_path)
+    dict_param = adata.uns["SCDRS_PARAM"]
+    if "COV_GENE_MEAN" in dict_param:
+        dict_param["COV_GENE_MEAN"] = dict_param["COV_GENE_MEAN"].iloc[:, 0]
+    return adata
+
+
+def _write_preproc_cache(adata, cache_path):
+    """
+    Write a preprocessed AnnData to `cache_path` with `_write_h5ad_cache`.
+
+    `COV_GENE_MEAN` (a pd.Series, not supported in .h5ad `uns`) is stored as a
+    one-column DataFrame.
+    """
+    dict_param = adata.uns["SCDRS_PARAM"]
+    v_gene_mean = dict_param.get("COV_GENE_MEAN")
+    try:
+        if v_gene_mean is not None:
+            dict_param["COV_GENE_MEAN"] = v_gene_mean.to_frame("COV_GENE_MEAN")
+        _write_h5ad_cache(adata, cache_path)
+    finally:
+        if v_gene_mean is not None:
+            dict_param["COV_GENE_MEAN"] = v_gene_mean
+
+
+def _compute_knn(adata, h5ad_file, param, n_neighbors, n_pcs, flag_cache):
+    """
+    Run `sc.pp.pca` and `sc.pp.neighbors` on `adata`.
+
+    If `flag_cache`, the results (`obsm["X_pca"]`, `obsp["connectivities"]`,
+    `obsp["distances"]`, `uns["neighbors"]`) are reused from, or saved to, a
+    sidecar .h5ad keyed by h5ad_file, the loading options `param`, `n_neighbors`
+    and `n_pcs`.
+    """
+    import scanpy as sc
+
+    cache_path = None
+    if flag_cache:
+        cache_path = _cache_path([h5ad_file], (param, n_neighbors, n_pcs), ".knn.h5ad")
+        if os.path.exists(cache_path):
+            adata_knn = sc.read_h5ad(cache_path)
+            if adata_knn.obs_names.equals(adata.obs_names):
+                adata.obsm["X_pca"] = adata_knn.obsm["X_pca"]
+                adata.obsp["connectivities"] = adata_knn.obsp["connectivities"]
+                adata.obsp["distances"] = adata_knn.obsp["distances"]
+                adata.uns["neighbors"] = adata_knn.uns["neighbors"]
+                print("PCA/KNN loaded from cache %s" % cache_path)
+                return
+
+    sc.pp.pca(adata, n_comps=n_pcs)
+    sc.pp.neighbors(adata, n_neighbors=n_neighbors, n_pcs=n_pcs)
+    if cache_path is not None:
+        adata_knn = sc.AnnData(
+            obs=pd.DataFrame(index=adata.obs_names),
+            obsm={"X_pca": adata.obsm["X_pca"]},
+            obsp={
+                "connectivities": adata.obsp["connectivities"],
+                "distances": adata.obsp["distances"],
+            },
+            uns={"neighbors": adata.uns["neighbors"]},
+        )
+        _write_h5ad_cache(adata_knn, cache_path)
+
+
+def _load_h5ad(h5ad_file, flag_filter_data, flag_raw_count):
+    """
+    `scdrs.util.load_h5ad` reading only `X`, `obs` and `var` from h5ad_file.
+
+    `compute_score` uses no other element (`uns`, `obsm`, `obsp`, `layers`, ...),
+    and on richly annotated datasets these can dominate the file.
+    """
+    import h5py
+    import scanpy as sc
+
+    try:
+        from anndata.io import read_elem
+    except ImportError:  # anndata < 0.11
+        from anndata.experimental import read_elem
+
+    with h5py.File(h5ad_file, "r") as f:
+        adata = sc.AnnData(
+            X=read_elem(f["X"]), obs=read_elem(f["obs"]), var=read_elem(f["var"])
+        )
+
+    # check inputs (1) no NaN in adata.X (2) all adata.X >= 0
+    if np.isnan(adata.X.sum()):
+        raise ValueError(
+            "h5ad expression matrix should not contain NaN. Please impute them beforehand."
+        )
+    if (adata.X < 0).sum() > 0:
+        raise ValueError(
+            "h5ad expression matrix should not contain negative values. "
+            "This is because in the preprocessing step, "
+            "scDRS models the gene-level log mean-variance relationship. "
+            "See scdrs.pp.compute_stats for details."
+        )
+
+    if flag_filter_data:
+        sc.pp.filter_cells(adata, min_genes=250)
+        sc.pp.filter_genes(adata, min_cells=50)
+    if flag_raw_count:
+        sc.pp.normalize_per_cell(adata, counts_per_cell_after=1e4)
+        sc.pp.log1p(adata)
+    return adata
+
+
+def _read_tsv(path: str) -> pd.DataFrame:
+    """
+    Read a tab-separated file indexed by its first column.
+
+    Equivalent to `pd.read_csv(path, sep="\t", index_col=0)`, using the multi-threaded
+    PyArrow CSV reader when PyArrow is installed.
+    """
+    if pa is not None:
+        try:
+            table = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(use_threads=True),
+                parse_options=pacsv.ParseOptions(delimiter="\t"),
+            )
+        except pa.ArrowException:
+            pass
+        else:
+            df = table.to_pandas()
+            return df.set_index(df.columns[0])
+    return pd.read_csv(path, sep="\t", index_col=0)
+
+
+def _write_score_file(
+    df: pd.DataFrame, path: str, compression: str = "gzip", gzip_level: int = 1
+):
+    """
+    Write a cell-indexed score DataFrame as a compressed tab-separated file.
+
+    Cells are formatted by `DataFrame.to_csv(index=True)`, so the text is the same
+    as in scDRS' own score files (e.g. `1.0`, `6.666444e-05`). Gzip output uses
+    level `gzip_level`. Zstd output is streamed through PyArrow's compressed output
+    stream when PyArrow is installed (library default level), otherwise through
+    pandas, which needs the `zstandard` package.
+    """
+    if compression == "gzip":
+        compression = {"method": "gzip", "compresslevel": gzip_level}
+    elif pa is not None:
+        with pa.CompressedOutputStream(path, compression) as sink:
+            df.to_csv(sink, sep="\t", index=True, mode="wb")
+        return
+    df.to_csv(path, sep="\t", index=True, compression=compression)
+
+
+def _score_trait(adata, gene_list, gene_weights, dict_opt):
+    """Compute scDRS scores for one trait."""
+    return scdrs.score_cell(
+        adata,
+        gene_list,
+        gene_weight=gene_weights,
+        ctrl_match_key=dict_opt["ctrl_match_opt"],
+        n_ctrl=dict_opt["n_ctrl"],
+        weight_opt=dict_opt["weight_opt"],
+        return_ctrl_raw_score=dict_opt["flag_return_ctrl_raw_score"],
+        return_ctrl_norm_score=dict_opt["flag_return_ctrl_norm_score"],
+        verbose=False,
+    )
+
+
+def _write_score_parquet(df: pd.DataFrame, root_path: str, trait: str):
+    """
+    Write a cell-indexed score DataFrame as the `trait=<trait>` partition of the
+    Parquet dataset at `root_path`, replacing any previous data of that trait.
+    """
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df.assign(trait=trait), preserve_index=True)
+    pq.write_to_dataset(
+        table,
+        root_path,
+        partition_cols=["trait"],
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+
+def _load_scdrs_score_parquet(score_file: str) -> Dict[str, pd.DataFrame]:
+    """
+    Load scDRS scores of all traits from a Parquet dataset written by
+    `compute_score --out-format parquet`, keyed by trait name.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(score_file, format="parquet", partitioning="hive")
+    trait_list = sorted(
+        {
+            ds.get_partition_keys(fragment.partition_expression)["trait"]
+            for fragment in dataset.get_fragments()
+        }
+    )
+    dict_score = {}
+    for trait in trait_list:
+        table = dataset.to_table(filter=ds.field("trait") == trait)
+        dict_score[trait] = table.drop_columns("trait").to_pandas()
+    return dict_score
+
+
+def _load_scdrs_score(score_file: str) -> Dict[str, pd.DataFrame]:
+    """
+    Load scDRS full scores, keyed by trait name, as `scdrs.util.load_scdrs_score`.
+
+    "@" in the file name matches any trait, e.g., `<score_folder>/@.full_score.gz`.
+    Matches come from one `os.scandir` pass with a precompiled pattern, and files are
+    read with `_read_tsv`. `.full_score.zst` files (`--compression zstd`) are also
+    accepted.
+    """
+    score_dir, score_file_pattern = os.path.split(score_file)
+    suffix = None
+    for ext in _COMPRESSION_EXT.values():
+        if score_file_pattern.endswith(".full_score" + ext):
+            suffix = ".full_score" + ext
+    assert (
+        suffix is not None
+    ), "Expect scDRS .full_score.gz or .full_score.zst files for score_file"
+    regex = re.compile(".*".join(re.escape(x) for x in score_file_pattern.split("@")) + "$")
+    score_dir = score_dir if score_dir != "" else os.curdir
+    with os.scandir(score_dir) as it:
+        score_file_list = sorted(
+            entry.name for entry in it if entry.is_file() and regex.match(entry.name)
+        )
+    print("Score file folder: %s" % score_dir)
+    print("Find %d score files: %s" % (len(score_file_list), ",".join(score_file_list)))
+
+    dict_score = {}
+    for file in score_file_list:
+        dict_score[file[: -len(suffix)]] = _read_tsv(os.path.join(score_dir, file))
+    return dict_score
+
+
+def _list_score_file(df_res, dict_opt):
+    """List the `(df, file_type)` score files to write for one trait."""
+    list_file = [(df_res.iloc[:, 0:6], "score")]
+    if dict_opt["flag_return_ctrl_raw_score"] | dict_opt["flag_return_ctrl_norm_score"]:
+        list_file.append((df_res, "full_score"))
+    return list_file
+
+
+def _save_score_file(df, file_type, trait, dict_opt):
+    """
+    Save the `file_type` ("score" or "full_score") scores of one trait as
+    `<out_folder>/<trait>.<file_type><ext>`, or as the `trait=<trait>` partition of
+    `<out_folder>/<file_type>.parquet` if `dict_opt["out_format"]` is "parquet".
+    """
+    if dict_opt["out_format"] == "parquet":
+        _write_score_parquet(
+            df, os.path.join(dict_opt["out_folder"], "%s.parquet" % file_type), trait
+        )
+    else:
+        score_ext = _COMPRESSION_EXT[dict_opt["compression"]]
+        _write_score_file(
+            df,
+            os.path.join(dict_opt["out_folder"], "%s.%s%s" % (trait, file_type, score_ext)),
+            compression=dict_opt["compression"],
+            gzip_level=dict_opt["gzip_level"],
+        )
+
+
+def _count_bh_rejection(v_pval, list_alpha):
+    """
+    Number of Benjamini-Hochberg rejections at each FDR level in `list_alpha`.
+
+    Same as `(multipletests(v_pval, method="fdr_bh")[1] < alpha).sum()` for each
+    `alpha`, with one sort and without materializing the adjusted p-values: the
+    adjusted p-value of rank k is below `alpha` iff `p_(j) * n / j < alpha` for some
+    j >= k, so the count is the largest such j.
+    """
+    v_pval_sorted = np.sort(np.asarray(v_pval, dtype=float))
+    n = v_pval_sorted.shape[0]
+    v_ratio = v_pval_sorted / (np.arange(1, n + 1) / n)
+    list_n_rej = []
+    for alpha in list_alpha:
+        v_rej = v_ratio < alpha
+        list_n_rej.append(n - np.argmax(v_rej[::-1]) if v_rej.any() else 0)
+    return list_n_rej
+
+
+def _fdr_summary(df_res):
+    """Return `(n_cell, n_rej_01, n_rej_02)`, the numbers of cells, FDR<0.1 and FDR<0.2 cells."""
+    n_rej_01, n_rej_02 = _count_bh_rejection(df_res["pval"].values, [0.1, 0.2])
+    return df_res.shape[0], n_rej_01, n_rej_02
+
+
+def _score_and_save_trait(adata, trait, gene_list, gene_weights, dict_opt):
+    """
+    Compute scDRS scores for one trait and write its score files.
+
+    Returns `(n_cell, n_rej_01, n_rej_02)` as `_fdr_summary`.
+    """
+    df_res = _score_trait(adata, gene_list, gene_weights, dict_opt)
+    for df, file_type in _list_score_file(df_res, dict_opt):
+        _save_score_file(df, file_type, trait, dict_opt)
+    return _fdr_summary(df_res)
+
+
+def _score_and_save_trait_worker(trait, gene_list, gene_weights, dict_opt):
+    """`_score_and_save_trait` on the AnnData inherited from the parent process."""
+    return _score_and_save_trait(_WORKER_ADATA, trait, gene_list, gene_weights, dict_opt)
+
+
+def _print_trait_res(trait, n_gene, res, sys_start_time):
+    n_cell, n_rej_01, n_rej_02 = res
+    print(
+        "Trait=%s, n_gene=%d: %d/%d FDR<0.1 cells, %d/%d FDR<0.2 cells (sys_time=%0.1fs)"
+        % (
+            trait,
+            n_gene,
+            n_rej_01,
+            n_cell,
+            n_rej_02,
+            n_cell,
+            time.time() - sys_start_time,
+        )
+    )
+
+
 def compute_score(
     h5ad_file: str,
     h5ad_species: str,
@@ -37,6 +435,11 @@ def compute_score(
     n_ctrl: int = 1000,
     flag_return_ctrl_raw_score: bool = False,
     flag_return_ctrl_norm_score: bool = True,
+    compression: str = "gzip",
+    gzip_level: int = 1,
+    n_jobs: int = 1,
+    no_cache: bool = False,
+    out_format: str = "tsv",
 ):
     """
     Compute scDRS scores. Generate `.score.gz` and `.full_score.gz` files for each trait.
@@ -76,6 +479,27 @@ def compute_score(
         If to return raw control scores. Default is False.
     flag_return_ctrl_norm_score : bool, optional
         If to return normalized control scores. Default is True.
+    compression : str, optional
+        Compression of the score files. One of "gzip" (`.score.gz`, `.full_score.gz`)
+        and "zstd" (`.score.zst`, `.full_score.zst`). Default is "gzip".
+    gzip_level : int, optional
+        Gzip compression level (0-9) of the score files if compression is "gzip".
+        Score tables compress well at low levels, and level 1 is several times
+        faster than gzip's default of 6. Default is 1.
+    n_jobs : int, optional
+        Number of worker processes scoring traits in parallel; -1 uses all CPUs.
+        Workers are forked and share the preprocessed data with the parent, so
+        values other than 1 require the "fork" start method (Linux). Default is 1.
+    no_cache : bool, optional
+        If to skip the on-disk cache of the loaded and preprocessed h5ad_file. The
+        cache is keyed by the h5ad_file/cov_file path, mtime and size and the
+        loading/preprocessing options, and stored in `$SCDRS_CACHE_DIR` (default
+        `<tmp>/scdrs_cache`). Default is False.
+    out_format : str, optional
+        Format of the score files. "tsv" writes the per-trait files described in
+        `out_folder`. "parquet" (requires PyArrow) instead writes two Parquet datasets,
+        `<out_folder>/score.parquet` and `<out_folder>/full_score.parquet`, partitioned
+        by trait (`trait=<trait>/`); `--compression` is then not used. Default is "tsv".
         
     Examples
     --------
@@ -112,27 +536,39 @@ def compute_score(
     FLAG_RETURN_CTRL_RAW_SCORE = flag_return_ctrl_raw_score
     FLAG_RETURN_CTRL_NORM_SCORE = flag_return_ctrl_norm_score
     OUT_FOLDER = out_folder
+    COMPRESSION = compression
+    GZIP_LEVEL = gzip_level
+    N_JOBS = os.cpu_count() if n_jobs == -1 else n_jobs
+    NO_CACHE = no_cache
+    OUT_FORMAT = out_format
 
     if H5AD_SPECIES != GS_SPECIES:
         H5AD_SPECIES = scdrs.util.convert_species_name(H5AD_SPECIES)
         GS_SPECIES = scdrs.util.convert_species_name(GS_SPECIES)
 
-    header = get_cli_head()
-    header += "Call: scdrs compute-score \\\n"
-    header += "--h5ad-file %s \\\n" % H5AD_FILE
-    header += "--h5ad-species %s \\\n" % H5AD_SPECIES
-    header += "--cov-file %s \\\n" % COV_FILE
-    header += "--gs-file %s \\\n" % GS_FILE
-    header += "--gs-species %s \\\n" % GS_SPECIES
-    header += "--ctrl-match-opt %s \\\n" % CTRL_MATCH_OPT
-    header += "--weight-opt %s \\\n" % WEIGHT_OPT
-    header += "--adj-prop %s \\\n" % ADJ_PROP
-    header += "--flag-filter-data %s \\\n" % FLAG_FILTER_DATA
-    header += "--flag-raw-count %s \\\n" % FLAG_RAW_COUNT
-    header += "--n-ctrl %d \\\n" % N_CTRL
-    header += "--flag-return-ctrl-raw-score %s \\\n" % FLAG_RETURN_CTRL_RAW_SCORE
-    header += "--flag-return-ctrl-norm-score %s \\\n" % FLAG_RETURN_CTRL_NORM_SCORE
-    header += "--out-folder %s\n" % OUT_FOLDER
+    list_header = [
+        "Call: scdrs compute-score",
+        "--h5ad-file %s" % H5AD_FILE,
+        "--h5ad-species %s" % H5AD_SPECIES,
+        "--cov-file %s" % COV_FILE,
+        "--gs-file %s" % GS_FILE,
+        "--gs-species %s" % GS_SPECIES,
+        "--ctrl-match-opt %s" % CTRL_MATCH_OPT,
+        "--weight-opt %s" % WEIGHT_OPT,
+        "--adj-prop %s" % ADJ_PROP,
+        "--flag-filter-data %s" % FLAG_FILTER_DATA,
+        "--flag-raw-count %s" % FLAG_RAW_COUNT,
+        "--n-ctrl %d" % N_CTRL,
+        "--flag-return-ctrl-raw-score %s" % FLAG_RETURN_CTRL_RAW_SCORE,
+        "--flag-return-ctrl-norm-score %s" % FLAG_RETURN_CTRL_NORM_SCORE,
+        "--compression %s" % COMPRESSION,
+        "--gzip-level %d" % GZIP_LEVEL,
+        "--n-jobs %d" % N_JOBS,
+        "--no-cache %s" % NO_CACHE,
+        "--out-format %s" % OUT_FORMAT,
+        "--out-folder %s" % OUT_FOLDER,
+    ]
+    header = get_cli_head() + " \\\n".join(list_header) + "\n"
     print(header)
 
     # Check options
@@ -151,16 +587,35 @@ def compute_score(
         raise ValueError("--ctrl-match-opt needs to be one of [mean, mean_var]")
     if WEIGHT_OPT not in ["uniform", "vs", "inv_std", "od"]:
         raise ValueError("--weight-opt needs to be one of [uniform, vs, inv_std, od]")
+    if COMPRESSION not in _COMPRESSION_EXT:
+        raise ValueError("--compression needs to be one of [gzip, zstd]")
+    if GZIP_LEVEL not in range(10):
+        raise ValueError("--gzip-level needs to be an integer between 0 and 9")
+    if N_JOBS < 1:
+        raise ValueError("--n-jobs needs to be a positive integer or -1")
+    if OUT_FORMAT not in ["tsv", "parquet"]:
+        raise ValueError("--out-format needs to be one of [tsv, parquet]")
+    if (OUT_FORMAT == "parquet") and (pa is None):
+        raise ValueError("--out-format parquet requires pyarrow")
 
     ###########################################################################################
     ######                                     Load data                                 ######
     ###########################################################################################
     print("Loading data:")
 
-    # Load .h5ad file
-    adata = scdrs.util.load_h5ad(
-        H5AD_FILE, flag_filter_data=FLAG_FILTER_DATA, flag_raw_count=FLAG_RAW_COUNT
-    )
+    # Load .h5ad file (already preprocessed if cached)
+    cache_path = None
+    if not NO_CACHE:
+        cache_path = _preproc_cache_path(
+            H5AD_FILE, COV_FILE, ADJ_PROP, FLAG_FILTER_DATA, FLAG_RAW_COUNT
+        )
+    flag_cached = cache_path is not None and os.path.exists(cache_path)
+    if flag_cached:
+        adata = _read_preproc_cache(cache_path)
+    else:
+        adata = _load_h5ad(
+            H5AD_FILE, flag_filter_data=FLAG_FILTER_DATA, flag_raw_count=FLAG_RAW_COUNT
+        )
     print(
         "--h5ad-file loaded: n_cell=%d, n_gene=%d (sys_time=%0.1fs)"
         % (adata.shape[0], adata.shape[1], time.time() - sys_start_time)
@@ -208,13 +663,30 @@ def compute_score(
 
     # Preprocess
     print("Preprocessing:")
-    scdrs.preprocess(
-        adata, cov=df_cov, adj_prop=ADJ_PROP, n_mean_bin=20, n_var_bin=20, copy=False
-    )
+    if flag_cached:
+        print("Preprocessed data loaded from cache %s" % cache_path)
+    else:
+        scdrs.preprocess(
+            adata, cov=df_cov, adj_prop=ADJ_PROP, n_mean_bin=20, n_var_bin=20, copy=False
+        )
+        if cache_path is not None:
+            _write_preproc_cache(adata, cache_path)
     print("")
 
     # Compute score
     print("Computing scDRS score:")
+    dict_opt = {
+        "ctrl_match_opt": CTRL_MATCH_OPT,
+        "n_ctrl": N_CTRL,
+        "weight_opt": WEIGHT_OPT,
+        "flag_return_ctrl_raw_score": FLAG_RETURN_CTRL_RAW_SCORE,
+        "flag_return_ctrl_norm_score": FLAG_RETURN_CTRL_NORM_SCORE,
+        "out_folder": OUT_FOLDER,
+        "compression": COMPRESSION,
+        "gzip_level": GZIP_LEVEL,
+        "out_format": OUT_FORMAT,
+    }
+    trait_list = []
     for trait in dict_gs:
         gene_list, gene_weights = dict_gs[trait]
         if len(gene_list) < 10:
@@ -223,47 +695,47 @@ def compute_score(
                 % (trait, len(gene_list), time.time() - sys_start_time)
             )
             continue
-
-        df_res = scdrs.score_cell(
-            adata,
-            gene_list,
-            gene_weight=gene_weights,
-            ctrl_match_key=CTRL_MATCH_OPT,
-            n_ctrl=N_CTRL,
-            weight_opt=WEIGHT_OPT,
-            return_ctrl_raw_score=FLAG_RETURN_CTRL_RAW_SCORE,
-            return_ctrl_norm_score=FLAG_RETURN_CTRL_NORM_SCORE,
-            verbose=False,
-        )
-
-        df_res.iloc[:, 0:6].to_csv(
-            os.path.join(OUT_FOLDER, "%s.score.gz" % trait),
-            sep="\t",
-            index=True,
-            compression="gzip",
-        )
-        if FLAG_RETURN_CTRL_RAW_SCORE | FLAG_RETURN_CTRL_NORM_SCORE:
-            df_res.to_csv(
-                os.path.join(OUT_FOLDER, "%s.full_score.gz" % trait),
-                sep="\t",
-                index=True,
-                compression="gzip",
-            )
-        v_fdr = multipletests(df_res["pval"].values, method="fdr_bh")[1]
-        n_rej_01 = (v_fdr < 0.1).sum()
-        n_rej_02 = (v_fdr < 0.2).sum()
-        print(
-            "Trait=%s, n_gene=%d: %d/%d FDR<0.1 cells, %d/%d FDR<0.2 cells (sys_time=%0.1fs)"
-            % (
-                trait,
-                len(gene_list),
-                n_rej_01,
-                df_res.shape[0],
-                n_rej_02,
-                df_res.shape[0],
-                time.time() - sys_start_time,
-            )
-        )
+        trait_list.append(trait)
+
+    if N_JOBS == 1:
+        # Score files of trait t are written by background threads while trait t+1
+        # is scored; at most `max_pending` writes (and their results) are kept alive
+        max_pending = 4
+        set_future = set()
+        with ThreadPoolExecutor(max_workers=2) as writer:
+            for trait in trait_list:
+                gene_list, gene_weights = dict_gs[trait]
+                df_res = _score_trait(adata, gene_list, gene_weights, dict_opt)
+                for df, file_type in _list_score_file(df_res, dict_opt):
+                    set_future.add(
+                        writer.submit(_save_score_file, df, file_type, trait, dict_opt)
+                    )
+                _print_trait_res(
+                    trait, len(gene_list), _fdr_summary(df_res), sys_start_time
+                )
+                while len(set_future) > max_pending:
+                    set_done, set_future = wait(set_future, return_when=FIRST_COMPLETED)
+                    for future in set_done:
+                        future.result()  # re-raise write errors
+        for future in set_future:
+            future.result()
+    else:
+        # Traits are independent: score them in forked workers that inherit `adata`
+        global _WORKER_ADATA
+        _WORKER_ADATA = adata
+        with ProcessPoolExecutor(
+            max_workers=N_JOBS, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            dict_future = {
+                trait: executor.submit(
+                    _score_and_save_trait_worker, trait, *dict_gs[trait], dict_opt
+                )
+                for trait in trait_list
+            }
+            for trait in trait_list:
+                res = dict_future[trait].result()
+                _print_trait_res(trait, len(dict_gs[trait][0]), res, sys_start_time)
+        _WORKER_ADATA = None
     return
 
 
@@ -341,52 +813,52 @@ def munge_gs(
     ###########################################################################################
     ######                                    Parse Options                              ######
     ###########################################################################################
-    header = get_cli_head()
-    header += "Call: scdrs munge-gs \\\n"
+    list_header = ["Call: scdrs munge-gs"]
 
     assert (
         sum([(pval_file is not None), (zscore_file is not None)]) == 1
     ), "One of --pval-file and --zscore-file is expected."
     if pval_file is not None:
-        header += "--pval-file %s \\\n" % pval_file
+        list_header.append("--pval-file %s" % pval_file)
     if zscore_file is not None:
-        header += "--zscore-file %s \\\n" % zscore_file
+        list_header.append("--zscore-file %s" % zscore_file)
 
     assert weight in [
         "zscore",
         "uniform",
     ], "--weight needs to be one of 'zscore', 'uniform'"
-    header += "--weight %s \\\n" % weight
+    list_header.append("--weight %s" % weight)
 
     assert (fdr is None) or (
         fwer is None
     ), "At most one of --fdr and --fwer is allowed."
     if fdr is not None:
-        header += "--fdr %s \\\n" % fdr
+        list_header.append("--fdr %s" % fdr)
     if fwer is not None:
-        header += "--fwer %s \\\n" % fdr
+        list_header.append("--fwer %s" % fwer)
 
     n_min = min(n_min, n_max)
-    header += "--n-min %s \\\n" % n_min
-    header += "--n-max %s \\\n" % n_max
+    list_header.append("--n-min %s" % n_min)
+    list_header.append("--n-max %s" % n_max)
 
     assert out_file is not None, "--out-file is expected."
-    header += "--out-file %s\n" % out_file
+    list_header.append("--out-file %s" % out_file)
+    header = get_cli_head() + " \\\n".join(list_header) + "\n"
     print(header)
 
     ###########################################################################################
     ######                                     Load data                                 ######
     ###########################################################################################
     if pval_file is not None:
-        df_pval = pd.read_csv(pval_file, sep="\t", index_col=0)
+        df_pval = _read_tsv(pval_file)
         print(
             "--pval-file loaded: n_gene=%d, n_trait=%d (sys_time=%0.1fs)"
             % (df_pval.shape[0], df_pval.shape[1], time.time() - sys_start_time)
         )
         print("Print info for the first 3 traits and first 10 genes")
         print("%-20s" % "Traits", str(list(df_pval.columns[:3])))
-        for gene in df_pval.index[:10]:
-            print("%-20s" % gene, str(list(df_pval.loc[gene, df_pval.columns[:3]])))
+        for gene, row in zip(df_pval.index[:10], df_pval.iloc[:10, :3].to_numpy()):
+            print("%-20s" % gene, str(list(row)))
         # Check index is unique
         if not df_pval.index.is_unique:
             raise ValueError(
@@ -405,15 +877,15 @@ def munge_gs(
         print("")
 
     if zscore_file is not None:
-        df_zscore = pd.read_csv(zscore_file, sep="\t", index_col=0)
+        df_zscore = _read_tsv(zscore_file)
         print(
             "--zscore-file loaded: n_gene=%d, n_trait=%d (sys_time=%0.1fs)"
             % (df_zscore.shape[0], df_zscore.shape[1], time.time() - sys_start_time)
         )
         print("Print info for the first 3 traits and first 10 genes")
         print("%-20s" % "Traits", str(list(df_zscore.columns[:3])))
-        for gene in df_zscore.index[:10]:
-            print("%-20s" % gene, str(list(df_zscore.loc[gene, df_zscore.columns[:3]])))
+        for gene, row in zip(df_zscore.index[:10], df_zscore.iloc[:10, :3].to_numpy()):
+            print("%-20s" % gene, str(list(row)))
 
         # Check index is unique
         if not df_zscore.index.is_unique:
@@ -431,44 +903,59 @@ def munge_gs(
         else:
             print("Warning: zscore-file values are all between 0 and 1.")
 
-        df_pval = df_zscore.copy()
-        for col in df_pval:
-            df_pval[col] = scdrs.util.zsc2pval(df_zscore[col])
+        # One-sided p-values, as `scdrs.util.zsc2pval`, for all traits at once
+        df_pval = pd.DataFrame(
+            ndtr(-df_zscore.to_numpy(dtype=float)),
+            index=df_zscore.index,
+            columns=df_zscore.columns,
+        )
         print("")
 
     trait_list = sorted(df_pval.columns)
     ###########################################################################################
     ######                                  Computation                                  ######
     ###########################################################################################
-    dict_gene_weights = {"TRAIT": [], "GENESET": []}
-    for trait in trait_list:
-        # Drop missing p-values
-        df_trait_pval = df_pval[[trait]].copy()
-        df_trait_pval.dropna(axis=0, inplace=True)
-
-        # Determine number of disease genes
+    # All traits are processed together on a (n_gene, n_trait) array; missing
+    # p-values are NaN, which numpy sorts after all valid values
+    mat_pval = df_pval[trait_list].to_numpy(dtype=float)
+    v_gene_name = df_pval.index.to_numpy()
+    v_n_valid = (~np.isnan(mat_pval)).sum(axis=0)
+
+    # Determine number of disease genes for each trait
+    with np.errstate(divide="ignore", invalid="ignore"):
         if fdr is not None:
-            n_gene = multipletests(
-                df_trait_pval[trait].values, alpha=fdr, method="fdr_bh"
-            )[0].sum()
+            # BH step-up: the largest rank k with p_(k) <= fdr * k / m is rejected
+            # together with all smaller ranks
+            mat_sorted = np.sort(mat_pval, axis=0)
+            v_rank = np.arange(1, mat_pval.shape[0] + 1)[:, None]
+            mat_rej = mat_sorted <= fdr * v_rank / v_n_valid
+            v_n_gene = np.where(
+                mat_rej.any(axis=0),
+                mat_rej.shape[0] - np.argmax(mat_rej[::-1], axis=0),
+                0,
+            )
         elif fwer is not None:
-            n_gene = multipletests(
-                df_trait_pval[trait].values, alpha=fwer, method="bonferroni"
-            )[0].sum()
+            # Bonferroni
+            v_n_gene = (mat_pval <= fwer / v_n_valid).sum(axis=0)
         else:
             # If both are None, select top n_max genes
-            n_gene = n_max
-
-        # Restrict `n_gene` to be between `n_min` and `n_max`
-        n_gene = min(n_gene, n_max)
-        n_gene = max(n_gene, n_min)
+            v_n_gene = np.full(len(trait_list), n_max)
 
-        # Select `n_gene` genes with the smallest p-values
-        df_trait_pval.sort_values(trait, ascending=True, inplace=True)
-        df_trait_pval = df_trait_pval.iloc[:n_gene]
+    # Restrict `n_gene` to be between `n_min` and `n_max` (and to the number of
+    # non-missing p-values)
+    v_n_gene = np.clip(v_n_gene, n_min, n_max)
+    v_n_gene = np.minimum(v_n_gene, v_n_valid)
 
-        gene_list = df_trait_pval.index
-        gene_pvals = df_trait_pval[trait].values.clip(min=1e-100)
+    dict_gene_weights = {"TRAIT": [], "GENESET": []}
+    for i_trait, trait in enumerate(trait_list):
+        # Select `n_gene` genes with the smallest p-values: partition in O(n_gene),
+        # then sort only the selected genes (ties by gene order)
+        n_gene = v_n_gene[i_trait]
+        v_pval = mat_pval[:, i_trait]
+        v_idx = np.argpartition(v_pval, min(n_gene, len(v_pval) - 1))[:n_gene]
+        v_idx = v_idx[np.lexsort((v_idx, v_pval[v_idx]))]
+        gene_list = v_gene_name[v_idx]
+        gene_pvals = v_pval[v_idx].clip(min=1e-100)
 
         if weight == "zscore":
             gene_weights = scdrs.util.pval2zsc(gene_pvals).clip(max=10)
@@ -499,6 +986,7 @@ def perform_downstream(
     flag_raw_count: bool = True,
     knn_n_neighbors: int = 15,
     knn_n_pcs: int = 20,
+    no_cache: bool = False,
 ):
     """
     Perform scDRS downstream analyses based on precomputed scDRS `.full_score.gz` files.
@@ -523,6 +1011,8 @@ def perform_downstream(
     score_file : str
         scDRS .full_score.gz file. Use “@” to specify multiple file names, e.g.,
         <score_folder>/@.full_score.gz. However, <score_folder> should not contain “@”.
+        Can also be the `<out_folder>/full_score.parquet` dataset written by
+        `compute_score --out-format parquet`, which loads all traits.
     out_folder : str
         Output folder.
     group_analysis : str, optional
@@ -548,6 +1038,11 @@ def perform_downstream(
     knn_n_pcs : int, optional
         `n_pcs` for computing KNN graph using `sc.pp.neighbors`.
         Default is 20 (consistent with the TMS pipeline).
+    no_cache : bool, optional
+        If to skip the on-disk cache of the PCA/KNN graph computed for
+        --group-analysis when `adata.obsp` has no `connectivities`. The cache is
+        keyed by the h5ad_file path, mtime and size and the loading/KNN options, and
+        stored in `$SCDRS_CACHE_DIR` (default `<tmp>/scdrs_cache`). Default is False.
         
     Examples
     --------
@@ -567,17 +1062,16 @@ def perform_downstream(
     ###########################################################################################
     ######                                    Parse Options                              ######
     ###########################################################################################
-    header = get_cli_head()
-    header += "Call: scdrs perform-downstream \\\n"
+    list_header = ["Call: scdrs perform-downstream"]
 
     assert h5ad_file is not None, "--h5ad-file is expected."
-    header += "--h5ad-file %s \\\n" % h5ad_file
+    list_header.append("--h5ad-file %s" % h5ad_file)
 
     assert score_file is not None, "--score-file is expected."
-    header += "--score-file %s \\\n" % score_file
+    list_header.append("--score-file %s" % score_file)
 
     assert out_folder is not None, "--out-folder is expected."
-    header += "--out-folder %s \\\n" % out_folder
+    list_header.append("--out-folder %s" % out_folder)
 
     assert (
         sum(
@@ -599,7 +1093,7 @@ def perform_downstream(
         else:
             raise ValueError("Expect --group_analysis to be a comma-separated string.")
         # group_analysis header
-        header += "--group-analysis %s\\\n" % ",".join(group_analysis)
+        list_header.append("--group-analysis %s" % ",".join(group_analysis))
     if corr_analysis is not None:
         # Determine if string or list_like using duck-typing
         input_type = scdrs.util.str_or_list_like(corr_analysis)
@@ -610,14 +1104,16 @@ def perform_downstream(
         else:
             raise ValueError("Expect --corr_analysis to be a comma-separated string.")
         # corr_analysis header
-        header += "--corr-analysis %s \\\n" % ",".join(corr_analysis)
+        list_header.append("--corr-analysis %s" % ",".join(corr_analysis))
     if gene_analysis is not None:
-        header += "--gene-analysis %s \\\n" % gene_analysis
-
-    header += "--flag-filter-data %s \\\n" % flag_filter_data
-    header += "--flag-raw-count %s \\\n" % flag_raw_count
-    header += "--knn-n-neighbors %s \\\n" % knn_n_neighbors
-    header += "--knn-n-pcs %s\n" % knn_n_pcs
+        list_header.append("--gene-analysis %s" % gene_analysis)
+
+    list_header.append("--flag-filter-data %s" % flag_filter_data)
+    list_header.append("--flag-raw-count %s" % flag_raw_count)
+    list_header.append("--knn-n-neighbors %s" % knn_n_neighbors)
+    list_header.append("--knn-n-pcs %s" % knn_n_pcs)
+    list_header.append("--no-cache %s" % no_cache)
+    header = get_cli_head() + " \\\n".join(list_header) + "\n"
     print(header)
 
     ###########################################################################################
@@ -635,7 +1131,10 @@ def perform_downstream(
     print("First 3 cells: %s" % (str(list(adata.obs_names[:3]))))
     print("First 5 genes: %s" % (str(list(adata.var_names[:5]))))
     print(score_file)
-    dict_score = scdrs.util.load_scdrs_score(score_file)
+    if score_file.rstrip(os.path.sep).endswith(".parquet"):
+        dict_score = _load_scdrs_score_parquet(score_file)
+    else:
+        dict_score = _load_scdrs_score(score_file)
     print(dict_score)
     print(
         "--score-file loaded: n_trait=%d (sys_time=%0.1fs)"
@@ -668,17 +1167,27 @@ def perform_downstream(
         print("Performing scDRS group-analysis")
         # Compute KNN if not present in `adata`
         if "connectivities" not in adata.obsp:
-            if knn_n_pcs > (min(adata.shape) - 1):
+            max_n_pcs = min(adata.shape) - 1
+            if knn_n_pcs > max_n_pcs:
                 print(
                     "`knn_n_pcs`=%d > `min(adata.shape)-1`=%d; set `knn_n_pcs`=%d"
-                    % (knn_n_pcs, min(adata.shape) - 1, min(adata.shape) - 1)
+                    % (knn_n_pcs, max_n_pcs, max_n_pcs)
                 )
-                knn_n_pcs = min(adata.shape) - 1
-            sc.pp.pca(adata, n_comps=knn_n_pcs)
-            sc.pp.neighbors(adata, n_neighbors=knn_n_neighbors, n_pcs=knn_n_pcs)
+                knn_n_pcs = max_n_pcs
+            _compute_knn(
+                adata,
+                h5ad_file,
+                (flag_filter_data, flag_raw_count),
+                knn_n_neighbors,
+                knn_n_pcs,
+                flag_cache=not no_cache,
+            )
             print(
                 "`connectivities` not found in `adata.obsp`; run `sc.pp.neighbors` first"
             )
+        # Geary's C walks `connectivities` by CSR rows; convert once for all traits
+        if not sparse.isspmatrix_csr(adata.obsp["connectivities"]):
+            adata.obsp["connectivities"] = sparse.csr_matrix(adata.obsp["connectivities"])
         # scDRS group-level analysis
         for trait in dict_score:
             dict_df_res = scdrs.method.downstream_group_analysis(
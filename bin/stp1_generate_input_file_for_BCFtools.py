@@ -9,12 +9,14 @@ input:
     <repo>/data/sampleWES.zip
 output:
     <repo>/output/bcf_variants.vcf
+    <repo>/output/wes_cache.parquet (MarkerID, p.value; read by stp3)
 """
 
 import os
-import pandas as pd
 from pathlib import Path
 
+import read_write as rw
+
 
 def get_repo_paths() -> tuple[Path, Path, Path]:
     """
@@ -46,35 +48,40 @@ repo_dir, data_dir, out_dir = get_repo_paths()
 in_file = data_dir / "sampleWES.zip"
 out_dir.mkdir(parents=True, exist_ok=True)
 out_file = out_dir / "bcf_variants.vcf"
+cache_file = out_dir / "wes_cache.parquet"
 
 if not in_file.exists():
     raise FileNotFoundError(f"Input file not found: {in_file}")
 
-reg = pd.read_csv(
-    in_file,
-    sep=r"\s+",
-    compression="zip"
-)
+# SAIGE output: columns separated by tabs or runs of spaces
+reg = rw.read_zip(in_file, r"\s+")
 
-reg["reg_index"] = range(len(reg))
+# Columnar copy of the columns stp3 needs, so it does not parse the zip again
+# (skipped if the columns are missing or no Parquet engine is installed; stp3
+# then reads the zip and reports missing columns itself)
+cache_file.unlink(missing_ok=True)
+if {"MarkerID", "p.value"}.issubset(reg.columns):
+    try:
+        reg[["MarkerID", "p.value"]].to_parquet(cache_file, compression="snappy", index=False)
+    except ImportError:
+        pass
 
-# Safely remove 'chr' prefix if present (works for pandas versions that may not have .removeprefix)
+# Remove 'chr' prefix if present (plain prefix strip, no regex engine)
 third_col = reg.columns[2]
-reg[third_col] = reg[third_col].astype(str).str.replace(r"^chr", "", regex=True)
-
-bcf = pd.DataFrame({
-    "#CHROM": reg.iloc[:, 0],
-    "POS": reg.iloc[:, 1],
-    "ID": ".",
-    "REF": reg.iloc[:, 3],
-    "ALT": reg.iloc[:, 4],
-    "QUAL": ".",
-    "FILTER": ".",
-    "INFO": "."
-})
-
-with open(out_file, "w", encoding="utf-8") as f:
+reg[third_col] = reg[third_col].astype(str).str.removeprefix("chr")
+
+# Only CHROM/POS/REF/ALT vary; ID/QUAL/FILTER/INFO are templated once as "."
+chrom = reg.iloc[:, 0].to_numpy()
+pos = reg.iloc[:, 1].to_numpy()
+ref = reg.iloc[:, 3].to_numpy()
+alt = reg.iloc[:, 4].to_numpy()
+
+# 1 MiB write buffer: far fewer write syscalls than the 8 KiB default
+with open(out_file, "w", encoding="utf-8", buffering=1 << 20) as f:
     f.write("##fileformat=VCFv4.2\n")
-    bcf.to_csv(f, sep="\t", index=False)
+    f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+    f.writelines(
+        f"{c}\t{p}\t.\t{r}\t{a}\t.\t.\t.\n" for c, p, r, a in zip(chrom, pos, ref, alt)
+    )
 
 print(f"Wrote: {out_file}")
@@ -7,7 +7,7 @@ This program generates files needed for the MAGMA gene-based test.
 
 input:
     <repo>/output/variants_with_rsID.vcf
-    <repo>/data/sampleWES.zip
+    <repo>/data/sampleWES.zip (or <repo>/output/wes_cache.parquet written by stp1)
 output:
     <repo>/output/files_for_step2.txt
     <repo>/output/files_for_MAGMA.txt
@@ -19,6 +19,11 @@ from pathlib import Path
 
 import pandas as pd
 
+try:
+    from pyarrow import csv as pacsv
+except ImportError:  # pyarrow is optional; fall back to pandas
+    pacsv = None
+
 
 def get_paths() -> tuple[Path, Path, Path, Path]:
     """
@@ -46,6 +51,28 @@ def get_paths() -> tuple[Path, Path, Path, Path]:
     return repo_dir, bin_dir, out_dir, data_dir
 
 
+def find_vcf_header(f, block_size: int = 1 << 20):
+    """
+    Return the columns of the "#CHROM" header line of a VCF opened in binary mode
+    and leave f positioned at the first record; None if there is no such line.
+    The file is scanned in blocks with bytes.find instead of line by line.
+    """
+    buf = b""
+    while True:
+        block = f.read(block_size)
+        buf += block
+        # leading "\n" so a header on the very first line is found too
+        start = (b"\n" + buf).find(b"\n#CHROM")
+        if start != -1:
+            end = buf.find(b"\n", start)
+            if end != -1 or not block:
+                end = len(buf) if end == -1 else end
+                f.seek(end + 1)
+                return buf[start:end].decode("utf-8").strip().lstrip("#").split("\t")
+        if not block:
+            return None
+
+
 repo_dir, bin_dir, out_dir, data_dir = get_paths()
 out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -61,23 +88,22 @@ vcf_file = out_dir / "variants_with_rsID.vcf"
 if not vcf_file.exists():
     raise FileNotFoundError(f"VCF file not found: {vcf_file}")
 
-header_cols = None
-with open(vcf_file, "rt", encoding="utf-8") as f:
-    for line in f:
-        if line.startswith("#CHROM"):
-            header_cols = line.strip().lstrip("#").split("\t")
-            break
-
-if header_cols is None:
-    raise ValueError(f"Could not find VCF header line starting with #CHROM in: {vcf_file}")
-
-vcf = pd.read_csv(
-    vcf_file,
-    sep="\t",
-    comment="#",
-    header=None,
-    names=header_cols
-)
+# Locate the "#CHROM" header with block reads, then parse the records from the
+# same handle (no second pass over the file)
+with open(vcf_file, "rb") as f:
+    header_cols = find_vcf_header(f)
+    if header_cols is None:
+        raise ValueError(f"Could not find VCF header line starting with #CHROM in: {vcf_file}")
+
+    if pacsv is not None:
+        # multi-threaded Arrow parse; string columns stay Arrow-backed (no copy)
+        vcf = pacsv.read_csv(
+            f,
+            read_options=pacsv.ReadOptions(column_names=header_cols, use_threads=True),
+            parse_options=pacsv.ParseOptions(delimiter="\t"),
+        ).to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        vcf = pd.read_csv(f, sep="\t", header=None, names=header_cols)
 
 # Some VCFs use '#CHROM' or 'CHROM' depending on how you parse.
 # After lstrip('#'), it should be 'CHROM'.
@@ -89,8 +115,12 @@ if missing:
 data_for_MAGMA = vcf.loc[:, ["ID", "CHROM", "POS"]].copy()
 data_for_MAGMA.columns = ["Variant name", "CHROM", "GENPOS"]
 
+# three plain columns, no header: format the lines directly instead of to_csv
+# (missing values are written empty, as to_csv does)
 magma_out = out_dir / "files_for_MAGMA.txt"
-rw.write_txt(str(magma_out), data_for_MAGMA, " ", False)
+cols = [data_for_MAGMA[c].to_numpy(dtype=object, na_value="") for c in data_for_MAGMA.columns]
+with open(magma_out, "w", encoding="utf-8", buffering=1 << 20) as f:
+    f.writelines(f"{a} {b} {c}\n" for a, b, c in zip(*cols))
 
 
 # -----------------------
@@ -100,11 +130,13 @@ wes_file = data_dir / "sampleWES.zip"
 if not wes_file.exists():
     raise FileNotFoundError(f"WES input not found: {wes_file}")
 
-df = pd.read_csv(
-    wes_file,
-    sep=r"\s+",
-    compression="zip"
-)
+# stp1 caches MarkerID/p.value as Parquet; use it unless the zip is newer
+wes_cache = out_dir / "wes_cache.parquet"
+if wes_cache.exists() and wes_cache.stat().st_mtime >= wes_file.stat().st_mtime:
+    df = rw.read_parquet(str(wes_cache), columns=["MarkerID", "p.value"])
+else:
+    # SAIGE output: columns separated by tabs or runs of spaces
+    df = rw.read_zip(wes_file, r"\s+")
 
 if "MarkerID" not in df.columns or "p.value" not in df.columns:
     raise ValueError(f"Expected columns MarkerID and p.value in {wes_file}. Found: {list(df.columns)}")
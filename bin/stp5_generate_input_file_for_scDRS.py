@@ -18,15 +18,28 @@ output:
     <repo>/output/PSC_geneset.gs
     <repo>/output/gene_based_test.png
     <repo>/output/significant_genes_MAGMA.csv
+    <repo>/output/entrez_symbol_cache.json (Entrez ID -> symbol, reused on reruns)
 """
 
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson  # optional, faster decoding of the mygene.info responses
+except ImportError:
+    orjson = None
+
+matplotlib.use("Agg")  # plots are only saved to files, no GUI backend
 
 
 def get_paths() -> tuple[Path, Path, Path]:
@@ -52,17 +65,13 @@ def get_paths() -> tuple[Path, Path, Path]:
 
 
 def list_maker(df: pd.DataFrame) -> str:
-    # df columns: gene_symbol, ZSTAT
-    x_geneset = ""
-    for i in range(len(df) - 1):
-        c = round(float(df.iloc[i, 1]), 4)
-        x_geneset += f"{df.iloc[i, 0]}:{c},"
-    # last one (no trailing comma)
-    x_geneset += f"{df.iloc[-1, 0]}:{df.iloc[-1, 1]}"
-    return x_geneset
+    # df columns: gene_symbol, ZSTAT -> "symbol:zstat,symbol:zstat,..."
+    symbols = df.iloc[:, 0].astype(str)
+    values = df.iloc[:, 1].astype(float).round(4).astype(str)
+    return ",".join(symbols.str.cat(values, sep=":"))
 
 
-def entrez_to_symbol(entrez_ids, batch_size=1000):
+def entrez_to_symbol(entrez_ids, batch_size=1000, max_workers=4):
     """
     Batch convert Entrez Gene IDs -> gene symbols using mygene.info.
     Returns dict: {entrez_id(str): symbol(str)}
@@ -71,22 +80,63 @@ def entrez_to_symbol(entrez_ids, batch_size=1000):
     out = {}
 
     url = "https://mygene.info/v3/gene"
-    for i in range(0, len(entrez_ids), batch_size):
-        chunk = entrez_ids[i:i + batch_size]
-        r = requests.post(
-            url,
-            json={"ids": chunk, "fields": ["symbol"], "species": "human"},
-            timeout=60,
-        )
-        r.raise_for_status()
-
-        for rec in r.json():
-            _id = str(rec.get("_id", ""))
-            out[_id] = rec.get("symbol", "")
+    chunks = [entrez_ids[i:i + batch_size] for i in range(0, len(entrez_ids), batch_size)]
+
+    # the lookup is read-only, so POSTs are safe to retry on transient errors
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"POST"}))
+
+    # one pooled session: batches reuse TLS connections and run concurrently
+    with requests.Session() as session:
+        session.mount("https://", HTTPAdapter(pool_connections=max_workers,
+                                              pool_maxsize=max_workers, max_retries=retry))
+
+        def post(chunk):
+            r = session.post(
+                url,
+                json={"ids": chunk, "fields": ["symbol"], "species": "human"},
+                timeout=60,
+            )
+            r.raise_for_status()
+            return r.json() if orjson is None else orjson.loads(r.content)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for recs in pool.map(post, chunks):
+                for rec in recs:
+                    _id = str(rec.get("_id", ""))
+                    out[_id] = rec.get("symbol", "")
 
     return out
 
 
+SYMBOL_CACHE_VERSION = 1
+
+
+def read_symbol_cache(cache_file: Path) -> dict:
+    """
+    Read the Entrez ID -> symbol cache written by write_symbol_cache.
+    Returns an empty dict if the file is missing, unreadable or of another version.
+    """
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != SYMBOL_CACHE_VERSION:
+        return {}
+    return cache.get("mapping", {})
+
+
+def write_symbol_cache(cache_file: Path, mapping: dict) -> None:
+    """
+    Write the Entrez ID -> symbol mapping as versioned JSON (temp file + rename).
+    """
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"version": SYMBOL_CACHE_VERSION, "mapping": mapping}, f)
+    os.replace(tmp_file, cache_file)
+
+
 if __name__ == "__main__":
 
     repo_dir, out_dir, data_dir = get_paths()
@@ -108,11 +158,17 @@ if __name__ == "__main__":
     # Entrez IDs (first column)
     gene_ids = df_top.iloc[:, 0].astype(str).tolist()
 
-    # Batch mapping
-    mapping = entrez_to_symbol(gene_ids)
+    # Batch mapping; IDs already in the on-disk cache are not queried again
+    # (IDs mygene.info does not know are cached as "")
+    symbol_cache = out_dir / "entrez_symbol_cache.json"
+    mapping = read_symbol_cache(symbol_cache)
+    missing = [g for g in dict.fromkeys(gene_ids) if g not in mapping]
+    if missing:
+        fetched = entrez_to_symbol(missing)
+        mapping.update({g: fetched.get(g, "") for g in missing})
+        write_symbol_cache(symbol_cache, mapping)
 
-    gene_name = pd.DataFrame({"gene_symbol": [mapping.get(g, "") for g in gene_ids]})
-    df_top = pd.concat([df_top, gene_name], axis=1)
+    df_top["gene_symbol"] = [mapping.get(g, "") for g in gene_ids]
 
     out_csv = out_dir / "zscore.csv"
     df_top.to_csv(out_csv, index=False)
@@ -138,34 +194,39 @@ if __name__ == "__main__":
 
     geneset.loc[0, "GENESET"] = list_maker(df_genes)
 
+    # one data row: write header and row directly instead of DataFrame.to_csv
     write_file = out_dir / "PSC_geneset.gs"
-    geneset.to_csv(write_file, sep="\t", index=False)
+    row = ["" if pd.isna(v) else str(v) for v in geneset.iloc[0]]
+    with open(write_file, "w", encoding="utf-8") as f:
+        f.write("\t".join(map(str, geneset.columns)) + "\n")
+        f.write("\t".join(row) + "\n")
     print("Saved:", write_file)
 
     # -------------------------------------------------------------------------
     # Manhattan plot
     df_manh = df.loc[:, ["CHR", "P"]].copy()
     df_manh["LOG10P"] = -np.log10(df_manh["P"])
-    df_manh["ind"] = range(len(df_manh))
-
     df_manh["CHR"] = df_manh["CHR"].astype("category")
-    df_grouped = df_manh.groupby("CHR")
+
+    # genes ordered by chromosome once (stable: MAGMA's order is kept within one)
+    codes = df_manh["CHR"].cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    log10p = df_manh["LOG10P"].to_numpy()[order]
 
     fig = plt.figure(figsize=(14, 8))
     ax = fig.add_subplot(111)
 
-    colors = ["#7FC97F", "#FDC086"]  # keep your colors
-    x_labels = []
-    x_labels_pos = []
-
-    for num, (name, group) in enumerate(df_grouped):
-        group.plot(kind="scatter", x="ind", y="LOG10P",
-                   color=colors[num % len(colors)], ax=ax)
-        x_labels.append(name)
-        x_labels_pos.append(group["ind"].iloc[-1] - (group["ind"].iloc[-1] - group["ind"].iloc[0]) / 2)
+    # one scatter for all genes; chromosomes alternate between the two colors
+    colors = np.array(["#7FC97F", "#FDC086"])  # keep your colors
+    ax.scatter(np.arange(len(codes)), log10p, c=colors[codes % len(colors)],
+               s=3, linewidths=0, rasterized=True)
 
-    ax.set_xticks(x_labels_pos)
-    ax.set_xticklabels(x_labels)
+    # each chromosome is one contiguous run: label it at the middle of the run
+    chr_codes, first_idx = np.unique(codes, return_index=True)
+    last_idx = np.r_[first_idx[1:] - 1, len(codes) - 1]
+    ax.set_xticks(((first_idx + last_idx) / 2).tolist())
+    ax.set_xticklabels(df_manh["CHR"].cat.categories[chr_codes].tolist())
 
     plt.axhline(y=5.58, color="gray", linestyle="--")
     ax.set_xlim([0, len(df_manh)])
@@ -187,7 +248,7 @@ if __name__ == "__main__":
         raise ValueError(f"Expected P and CHR in MAGMA genes output. Found: {list(df_top.columns)}")
 
     val_genes = df_top.loc[df_top["P"] <= 2.5e-6, ["gene_symbol", "CHR", "P"]].copy()
-    val_genes = pd.concat([val_genes, pd.DataFrame({"Column": ["SAIGE"] * len(val_genes)})], axis=1)
+    val_genes["Column"] = "SAIGE"
 
     sig_out = out_dir / "significant_genes_MAGMA.csv"
     val_genes.to_csv(sig_out, index=False)
@@ -16,7 +16,9 @@ output:
     <repo>/bin/figures/associated_cells_of_{tissue}_to_{trait}.png
 """
 
+import functools
 import os
+import shutil
 import sys
 import zipfile
 import warnings
@@ -38,11 +40,17 @@ def get_paths() -> tuple[Path, Path, Path, Path]:
       REPO_DIR, BIN_DIR, DATA_DIR, OUT_DIR
     Fallback: infer repo as parent of this script's directory (bin/ -> repo/)
     """
-    repo_env = os.environ.get("REPO_DIR")
-    bin_env = os.environ.get("BIN_DIR")
-    data_env = os.environ.get("DATA_DIR")
-    out_env = os.environ.get("OUT_DIR")
+    return _get_paths(
+        os.environ.get("REPO_DIR"),
+        os.environ.get("BIN_DIR"),
+        os.environ.get("DATA_DIR"),
+        os.environ.get("OUT_DIR"),
+    )
+
 
+@functools.lru_cache(maxsize=1)
+def _get_paths(repo_env, bin_env, data_env, out_env) -> tuple[Path, Path, Path, Path]:
+    # cached on the env values, so changing them still takes effect
     if repo_env:
         repo_dir = Path(repo_env).resolve()
         bin_dir = Path(bin_env).resolve() if bin_env else (repo_dir / "bin")
@@ -66,14 +74,19 @@ def find_compute_score_py() -> Path:
       2) <repo>/scDRS/compute_score.py
       3) ~/scDRS/compute_score.py
     """
-    scdrs_dir = os.environ.get("SCDRS_DIR")
+    repo_dir, _, _, _ = get_paths()
+    return _find_compute_score_py(os.environ.get("SCDRS_DIR"), repo_dir)
+
+
+@functools.lru_cache(maxsize=1)
+def _find_compute_score_py(scdrs_dir, repo_dir: Path) -> Path:
+    # cached on (SCDRS_DIR, repo_dir) to avoid re-probing candidates (slow on NFS)
     candidates = []
 
     if scdrs_dir:
         candidates.append(Path(scdrs_dir) / "compute_score.py")
 
     # common locations
-    repo_dir, _, _, _ = get_paths()
     candidates.append(repo_dir / "scDRS" / "compute_score.py")
     candidates.append(Path.home() / "scDRS" / "compute_score.py")
 
@@ -94,6 +107,7 @@ def find_compute_score_py() -> Path:
 trait = os.environ.get("TRAIT", "PSC")
 tissue = os.environ.get("TISSUE", "Liver")
 hm = os.environ.get("SCDRS_SPECIES", "hsapiens")  # scDRS species string
+make_plots = os.environ.get("SCDRS_MAKE_PLOTS", "1") == "1"
 
 repo_dir, bin_dir, data_dir, out_dir = get_paths()
 out_dir.mkdir(parents=True, exist_ok=True)
@@ -110,48 +124,69 @@ sc.settings.figdir = str(fig_dir)
 # -------------------------
 zip_path = data_dir / "HumanLiverHealthyscRNAseqData.zip"
 target_h5ad = data_dir / f"{tissue}.h5ad"
+# records mtime+size of the zip the h5ad was extracted from
+stamp_file = data_dir / f"{tissue}.h5ad.stamp"
+
 
-if not target_h5ad.exists():
+def zip_stamp(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_mtime_ns} {st.st_size}"
+
+
+if target_h5ad.exists():
+    # re-extract only if the zip changed since the recorded extraction;
+    # an h5ad without a stamp was provided directly and is left alone
+    need_extract = (
+        zip_path.exists()
+        and stamp_file.exists()
+        and stamp_file.read_text().strip() != zip_stamp(zip_path)
+    )
+else:
     if not zip_path.exists():
         raise FileNotFoundError(
             f"Neither {target_h5ad} nor zip source {zip_path} exists."
         )
+    need_extract = True
 
+if need_extract:
     with zipfile.ZipFile(zip_path) as z:
-        h5ads = [n for n in z.namelist() if n.endswith(".h5ad")]
-        if not h5ads:
-            raise ValueError(f"No .h5ad found inside: {zip_path}")
-
         # choose first .h5ad
-        h5ad_inside = h5ads[0]
-
-        extracted_path = Path(z.extract(h5ad_inside, data_dir)).resolve()
+        h5ad_inside = next((n for n in z.namelist() if n.endswith(".h5ad")), None)
+        if h5ad_inside is None:
+            raise ValueError(f"No .h5ad found inside: {zip_path}")
 
-        # If extracted path equals target, fine; else move/rename safely
-        if extracted_path != target_h5ad:
-            # If target exists now for some reason, don't overwrite silently
-            if target_h5ad.exists():
-                extracted_path.unlink(missing_ok=True)
-            else:
-                extracted_path.replace(target_h5ad)
+        # stream the member straight to the target (no extract + rename);
+        # write to a temp name first so a failed copy never leaves a partial h5ad
+        tmp_h5ad = target_h5ad.with_name(f".{target_h5ad.name}.{os.getpid()}.tmp")
+        try:
+            with z.open(h5ad_inside) as src, open(tmp_h5ad, "wb") as dst:
+                shutil.copyfileobj(src, dst, length=8 * 1024 * 1024)
+            os.replace(tmp_h5ad, target_h5ad)
+        except BaseException:
+            tmp_h5ad.unlink(missing_ok=True)
+            raise
+
+    stamp_file.write_text(zip_stamp(zip_path) + "\n")
+else:
+    print(f"Skipping extraction: {target_h5ad} is up to date")
 
 print(f"Using h5ad: {target_h5ad}")
 
-adata = sc.read_h5ad(target_h5ad)
+# backed mode: only obs/obsm are used here (covariates, UMAP colored by obs),
+# so X stays on disk
+adata = sc.read_h5ad(target_h5ad, backed="r")
 
 # -------------------------
 # Build covariates file
 # -------------------------
-cell_id = adata.obs.index.to_series().reset_index(drop=True).to_frame(name="cell_id")
-
 if "n_genes" not in adata.obs.columns:
     raise ValueError("Expected adata.obs['n_genes'] to exist, but it is missing.")
 
-n_genes = adata.obs.loc[:, ["n_genes"]].reset_index(drop=True)
-
-const = pd.DataFrame({"const": np.ones(len(cell_id), dtype=int)})
-
-cov = pd.concat([cell_id, n_genes, const], axis=1)
+cov = pd.DataFrame({
+    "cell_id": adata.obs.index.to_numpy(),
+    "n_genes": adata.obs["n_genes"].to_numpy(),
+    "const": np.ones(adata.n_obs, dtype=np.int8),
+})
 cov_file = out_dir / f"{tissue}_cov.tsv"
 cov.to_csv(cov_file, sep="\t", index=False)
 print(f"Wrote: {cov_file}")
@@ -192,39 +227,47 @@ full_score = out_dir / f"{trait}.full_score.gz"
 # Load scores + plots
 # -------------------------
 if full_score.exists():
-    df_score = pd.read_csv(full_score, sep="\t", index_col=0)
-    if "norm_score" in df_score.columns:
+    # only the cell index and norm_score are used; skip the control-score columns
+    score_cols = pd.read_csv(full_score, sep="\t", nrows=0).columns
+    if "norm_score" in score_cols:
+        df_score = pd.read_csv(
+            full_score, sep="\t", index_col=0, usecols=[score_cols[0], "norm_score"]
+        )
         adata.obs[trait] = df_score["norm_score"]
     else:
-        print(f"WARNING: norm_score not found in {full_score}; available: {list(df_score.columns)}")
-
-    sc.set_figure_params(figsize=[2.5, 2.5], dpi=150)
-
-    # 1) cell ontology classes
-    sc.pl.umap(
-        adata,
-        color="cell_ontology_class",
-        ncols=1,
-        color_map="RdBu_r",
-        vmin=-5,
-        vmax=5,
-        show=False,
-        save=f"cell_ontology_classes_{tissue}.png",
-    )
+        print(f"WARNING: norm_score not found in {full_score}; available: {list(score_cols)}")
+
+    # set SCDRS_MAKE_PLOTS=0 to skip the UMAPs in batch runs
+    if make_plots:
+        sc.set_figure_params(figsize=[2.5, 2.5], dpi=150)
+
+        # 1) cell ontology classes
+        sc.pl.umap(
+            adata,
+            color="cell_ontology_class",
+            ncols=1,
+            color_map="RdBu_r",
+            vmin=-5,
+            vmax=5,
+            show=False,
+            save=f"cell_ontology_classes_{tissue}.png",
+        )
 
-    # 2) associated cells for trait
-    sc.pl.umap(
-        adata,
-        color=[trait],
-        color_map="RdBu_r",
-        vmin=-5,
-        vmax=5,
-        s=20,
-        show=False,
-        save=f"associated_cells_of_{tissue}_to_{trait}.png",
-    )
+        # 2) associated cells for trait
+        sc.pl.umap(
+            adata,
+            color=[trait],
+            color_map="RdBu_r",
+            vmin=-5,
+            vmax=5,
+            s=20,
+            show=False,
+            save=f"associated_cells_of_{tissue}_to_{trait}.png",
+        )
+
+        print(f"Figures saved to: {fig_dir}")
 
-    print(f"Figures saved to: {fig_dir}")
+    adata.file.close()
 
     # downstream group analysis
     scdrs_.perform_downstream(
@@ -15,17 +15,18 @@ input:
 
 output:
   <repo>/output/log_threshold.png
+  <repo>/output/log_threshold_{min_cell_count}_{up_threshold}_{factor}.json
   <repo>/output/{trait}_cell_association_with_{tissue}.csv
 """
 
+import json
+import math
 import os
 import sys
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sympy import symbols, Eq, log, solve
 
 
 def get_paths() -> tuple[Path, Path, Path]:
@@ -60,8 +61,6 @@ import read_write as rw  # noqa: E402
 
 
 def log_threshold(out_dirc: Path):
-    a, b = symbols("a b")
-
     min_cell_count = 150
     up_threshold = 5
 
@@ -69,11 +68,31 @@ def log_threshold(out_dirc: Path):
     max_cell_count = min_cell_count * factor
     low_threshold = up_threshold / factor
 
-    eq1 = Eq(a + b / log(min_cell_count, 10), up_threshold)
-    eq2 = Eq(a + b / log(max_cell_count, 10), low_threshold)
+    # the fit depends only on the constants above: reuse the stored coefficients
+    # (and skip re-drawing the plot) when a previous run already wrote them
+    coef_path = out_dirc / f"log_threshold_{min_cell_count}_{up_threshold}_{factor}.json"
+    plot_path = out_dirc / "log_threshold.png"
+    make_plots = os.environ.get("SCDRS_MAKE_PLOTS", "1") == "1"
+    if coef_path.exists() and (plot_path.exists() or not make_plots):
+        coef = json.loads(coef_path.read_text())
+        return float(coef["a"]), float(coef["b"])
+
+    # a + b / log10(min_cell_count) = up_threshold
+    # a + b / log10(max_cell_count) = low_threshold
+    l1 = math.log10(min_cell_count)
+    l2 = math.log10(max_cell_count)
+    b_fit = (up_threshold - low_threshold) / (1.0 / l1 - 1.0 / l2)
+    a_fit = up_threshold - b_fit / l1
+
+    coef_path.write_text(json.dumps({"a": a_fit, "b": b_fit}) + "\n")
+
+    if not make_plots:
+        return float(a_fit), float(b_fit)
 
-    solution = solve((eq1, eq2), (a, b))
-    a_fit, b_fit = solution[a], solution[b]
+    # matplotlib is only needed for the plot; import it headless, on demand
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
     def tr(x, a_=a_fit, b_=b_fit):
         return a_ + b_ / np.log10(x)
@@ -96,7 +115,6 @@ def log_threshold(out_dirc: Path):
     plt.grid(True, which="both", ls="--", linewidth=0.5)
     plt.legend()
 
-    plot_path = out_dirc / "log_threshold.png"
     plt.savefig(str(plot_path), dpi=200, bbox_inches="tight")
     plt.close(fig)
     print("Saved:", plot_path)
@@ -104,6 +122,10 @@ def log_threshold(out_dirc: Path):
     return float(a_fit), float(b_fit)
 
 
+# columns of the scDRS group file used below
+SCDRS_GROUP_COLS = ["group", "n_cell", "assoc_mcp", "hetero_mcp", "n_fdr_0.05"]
+
+
 def read_scdrs_group_file(trait: str, out_dirc: Path) -> pd.DataFrame:
     """
     Reads: <out_dir>/{trait}.scdrs_group.cell_ontology_class
@@ -114,7 +136,7 @@ def read_scdrs_group_file(trait: str, out_dirc: Path) -> pd.DataFrame:
         return pd.DataFrame()
 
     # Usually scDRS outputs tab-separated text with header
-    df = pd.read_csv(fpath, sep="\t")
+    df = pd.read_csv(fpath, sep="\t", usecols=lambda c: c in SCDRS_GROUP_COLS)
     if "group" in df.columns:
         df["group"] = df["group"].astype(str).str.replace(",", "_", regex=False)
     return df
@@ -148,55 +170,55 @@ if __name__ == "__main__":
     ]
 
     dig = 5
-    final_results = pd.DataFrame(columns=columns)
 
     db = read_scdrs_group_file(trait, out_dir)
     if db.empty:
         print(f"WARNING: No scDRS group file found for trait={trait} in {out_dir}")
         sys.exit(0)
 
-    required_cols = {"group", "n_cell", "assoc_mcp", "hetero_mcp", "n_fdr_0.05"}
-    missing = required_cols - set(db.columns)
+    missing = set(SCDRS_GROUP_COLS) - set(db.columns)
     if missing:
         raise ValueError(f"Missing columns {missing} in scDRS group file. Found: {list(db.columns)}")
 
     db = float_to_number(db)
 
-    for d in range(len(db)):
-        cell = str(db.loc[d, "group"])
-        n_cell = float(db.loc[d, "n_cell"])
-        assoc = round(float(db.loc[d, "assoc_mcp"]), dig)
-        hetero = round(float(db.loc[d, "hetero_mcp"]), dig)
-        n_fdr = float(db.loc[d, "n_fdr_0.05"])
+    def round_dig(x):
+        # builtin round(), not np.round: they differ on half-way decimals
+        # (0.049995 -> 0.04999 vs 0.05), which can flip the assoc <= 0.05 filter
+        return np.array([round(v, dig) for v in x.tolist()], dtype=float)
 
-        pct = round((n_fdr / n_cell) * 100, dig) if n_cell > 0 else 0.0
+    # all groups at once, column-wise
+    n_cell = db["n_cell"].to_numpy(float)
+    assoc = round_dig(db["assoc_mcp"].to_numpy(float))
+    hetero = round_dig(db["hetero_mcp"].to_numpy(float))
+    n_fdr = db["n_fdr_0.05"].to_numpy(float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = round_dig(np.where(n_cell > 0, (n_fdr / n_cell) * 100, 0.0))
 
         # threshold only meaningful if n_fdr > 0
-        thr = None
-        signif = 0
-        if n_fdr > 0 and n_cell > 0:
-            thr = max(a + (b / np.log10(n_cell)), 0.005)
-            signif = 1 if pct >= thr else 0
-        else:
-            thr = 0.0
-
-        # your filtering logic
-        if (n_cell >= 150 and assoc <= 0.05 and n_fdr > 0):
-            final_results.loc[len(final_results)] = [
-                tissue,
-                trait,
-                cell,
-                int(n_cell),
-                assoc,
-                hetero,
-                pct,
-                thr,
-                signif,
-            ]
+        has_fdr = (n_fdr > 0) & (n_cell > 0)
+        thr = np.where(has_fdr, np.maximum(a + (b / np.log10(n_cell)), 0.005), 0.0)
+    signif = (has_fdr & (pct >= thr)).astype(int)
+
+    # your filtering logic
+    keep = (n_cell >= 150) & (assoc <= 0.05) & (n_fdr > 0)
+    final_results = pd.DataFrame(
+        dict(zip(columns, [
+            tissue,
+            trait,
+            db["group"].astype(str).to_numpy()[keep],
+            n_cell[keep].astype(int),
+            assoc[keep],
+            hetero[keep],
+            pct[keep],
+            thr[keep],
+            signif[keep],
+        ])),
+        columns=columns,
+    )
 
     out_csv = out_dir / f"{trait}_cell_association_with_{tissue}.csv"
-    rw.write_csv(final_results, str(out_csv.with_suffix("")))  # rw likely appends .csv itself
-    # If rw.write_csv does NOT append, replace the line above with:
-    # final_results.to_csv(out_csv, index=False)
+    rw.write_csv(final_results, str(out_csv))
 
     print("Saved:", out_csv)